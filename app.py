@@ -1,7 +1,13 @@
 import os
+import re
+import json
+import numpy as np
 import pandas as pd
 from dash import Dash, dcc, html, Input, Output, State
 import plotly.express as px
+import plotly.io as pio
+from flask_caching import Cache
+from data import load_data
 import logging
 
 # ======================
@@ -10,130 +16,85 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# orjson serializes plotly figures much faster than the stdlib encoder
+try:
+    import orjson
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    logger.warning("orjson not installed - using default JSON encoder")
+
 # ======================
 # Initialize Dash App FIRST
 # ======================
 app = Dash(__name__)
 server = app.server  # CRITICAL FOR DEPLOYMENT
 
+# Memoized report figures, keyed by the canonicalized filter state
+cache = Cache(server, config={"CACHE_TYPE": "SimpleCache", "CACHE_DEFAULT_TIMEOUT": 600})
+
 logger.info("Dash app initialized")
 
 # ======================
-# Data Loading with Error Handling
+# Data Loading
 # ======================
-def load_data():
-    """Load and prepare data with comprehensive error handling"""
-    try:
-        logger.info("Attempting to load CSV file...")
-        
-        # Try multiple possible file paths
-        csv_paths = [
-            "cleaned_collisions_persons.csv",
-            "./cleaned_collisions_persons.csv",
-            "/etc/secrets/cleaned_collisions_persons.csv"
-        ]
-        
-        df = None
-        for path in csv_paths:
-            try:
-                df = pd.read_csv(path, parse_dates=["CRASH_DATETIME"], low_memory=False)
-                logger.info(f"Successfully loaded data from {path}: {len(df)} rows")
-                break
-            except FileNotFoundError:
-                logger.warning(f"File not found at {path}, trying next...")
-                continue
-            except Exception as e:
-                logger.error(f"Error loading {path}: {e}")
-                continue
-        
-        if df is None:
-            logger.error("Could not load CSV from any path. Creating empty dataset.")
-            return pd.DataFrame()
-        
-        # Validate required columns
-        required_columns = ['BOROUGH', 'YEAR', 'VEHICLE TYPE CODE 1', 'CONTRIBUTING FACTOR VEHICLE 1', 'INJURY_TYPE']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            logger.warning(f"Missing columns: {missing_columns}")
-        
-        return df
-        
-    except Exception as e:
-        logger.error(f"Critical error in load_data: {e}")
-        return pd.DataFrame()
-
-# Load the data
 df = load_data()
 logger.info(f"Data preparation complete. Dataset shape: {df.shape}")
 
 # ======================
-# Vehicle Category Cleaner
+# Filter Helpers
 # ======================
-def normalize_vehicle(v):
-    """Normalize vehicle types with error handling"""
-    try:
-        if pd.isna(v):
-            return "UNKNOWN"
-        
-        s = str(v).upper()
-
-        # Vehicle type mapping
-        if "AMB" in s or "AMBUL" in s:
-            return "AMBULANCE"
-        if "TAXI" in s:
-            return "TAXI"
-        if "BUS" in s:
-            return "BUS"
-        if "MOTORCYCLE" in s or "SCOOTER" in s or "MOTORBIKE" in s:
-            return "MOTORCYCLE"
-        if "BICYCLE" in s or "BIKE" in s:
-            return "BICYCLE"
-        if "SUV" in s or "STATION WAGON" in s:
-            return "SUV"
-        if "PICK" in s or "PICK-UP" in s or "PICKUP" in s:
-            return "TRUCK/VAN"
-        if "TRUCK" in s or "VAN" in s:
-            return "TRUCK/VAN"
-        if "SEDAN" in s or "4 DOOR" in s or "4-DOOR" in s or "2 DOOR" in s or "2-DOOR" in s:
-            return "CAR"
-
-        return "OTHER"
-    except Exception as e:
-        logger.warning(f"Error normalizing vehicle '{v}': {e}")
-        return "UNKNOWN"
+def category_isin(series, values):
+    """Boolean mask for `series.isin(values)` compared on integer category codes"""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.isin(values).to_numpy(dtype=bool)
+    codes = pd.Categorical(values, categories=series.cat.categories).codes
+    return np.isin(series.cat.codes.to_numpy(), codes[codes >= 0])
 
-# Apply vehicle categorization safely
-if not df.empty and 'VEHICLE TYPE CODE 1' in df.columns:
-    df["VEHICLE_CATEGORY"] = df["VEHICLE TYPE CODE 1"].apply(normalize_vehicle)
-    logger.info("Vehicle categorization applied")
-else:
-    df["VEHICLE_CATEGORY"] = "UNKNOWN"
-    logger.warning("Vehicle categorization skipped - missing required column")
 
 # ======================
 # Dropdown Options with Fallbacks
 # ======================
-def get_dropdown_options(column, default_label="All"):
+# Dropdown name -> (column, fallback label)
+DROPDOWN_COLUMNS = {
+    "borough": ("BOROUGH", "Select Borough"),
+    "year": ("YEAR", "Select Year"),
+    "vehicle": ("VEHICLE_CATEGORY", "Vehicle Type"),
+    "factor": ("CONTRIBUTING FACTOR VEHICLE 1", "Contributing Factor"),
+    "injury": ("INJURY_TYPE", "Injury Type"),
+}
+
+def get_dropdown_options(frame, column, default_label="All"):
     """Safely generate dropdown options with fallbacks"""
     try:
-        if df.empty or column not in df.columns:
+        if frame.empty or column not in frame.columns:
             return [{"label": default_label, "value": "ALL"}]
         
-        unique_values = df[column].dropna().unique()
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            # Categories are already unique, non-null and sorted
+            unique_values = list(frame[column].cat.categories)
+        elif pd.api.types.is_integer_dtype(frame[column].dtype):
+            unique_values = sorted(int(val) for val in frame[column].dropna().unique())
+        else:
+            unique_values = sorted(frame[column].dropna().unique())
+
         if len(unique_values) == 0:
             return [{"label": default_label, "value": "ALL"}]
             
-        return [{"label": str(val).title(), "value": val} for val in sorted(unique_values)]
+        return [{"label": str(val).title(), "value": val} for val in unique_values]
     except Exception as e:
         logger.error(f"Error generating options for {column}: {e}")
         return [{"label": default_label, "value": "ALL"}]
 
 # Generate dropdown options
-borough_options = get_dropdown_options("BOROUGH", "Select Borough")
-year_options = get_dropdown_options("YEAR", "Select Year") 
-vehicle_options = get_dropdown_options("VEHICLE_CATEGORY", "Vehicle Type")
-factor_options = get_dropdown_options("CONTRIBUTING FACTOR VEHICLE 1", "Contributing Factor")
-injury_type_options = get_dropdown_options("INJURY_TYPE", "Injury Type")
+dropdown_options = {
+    name: get_dropdown_options(df, column, label)
+    for name, (column, label) in DROPDOWN_COLUMNS.items()
+}
+borough_options = dropdown_options["borough"]
+year_options = dropdown_options["year"]
+vehicle_options = dropdown_options["vehicle"]
+factor_options = dropdown_options["factor"]
+injury_type_options = dropdown_options["injury"]
 
 logger.info("Dropdown options generated")
 
@@ -251,49 +212,243 @@ logger.info("App layout created")
 # Search Text Logic
 # ======================
 BOROUGHS = ["BRONX", "BROOKLYN", "MANHATTAN", "QUEENS", "STATEN ISLAND"]
+# Search word -> (field, value); several words can map to the same injury type
+SEARCH_TERMS = {borough: ("borough", borough) for borough in BOROUGHS}
+SEARCH_TERMS.update({
+    "PEDESTRIAN": ("injury", "PEDESTRIAN"),
+    "CYCLIST": ("injury", "CYCLIST"),
+    "BICYCLE": ("injury", "CYCLIST"),
+    "MOTORIST": ("injury", "MOTORIST"),
+    "DRIVER": ("injury", "MOTORIST"),
+})
+# When several injury words appear, the first type in this list wins
+INJURY_PRIORITY = ["PEDESTRIAN", "CYCLIST", "MOTORIST"]
+
+# One alternation for every search word (matched anywhere, e.g. "bicyclist",
+# "brooklyn2022") plus whitespace-delimited 4-digit year tokens
+SEARCH_RE = re.compile(
+    r"("
+    + "|".join(re.escape(term).replace(r"\ ", r"\s+") for term in SEARCH_TERMS)
+    + r")|(?<!\S)(\d{4})(?!\S)"
+)
+
+def parse_search_text(text):
+    """Extract (borough, year, injury type) from free search text in one regex pass"""
+    if not text:
+        return None, None, None
+
+    boroughs = set()
+    injuries = set()
+    year_from_text = None
+    for match in SEARCH_RE.finditer(text.upper()):
+        term, year = match.groups()
+        if year:
+            if year_from_text is None and 2012 <= int(year) <= 2030:
+                year_from_text = int(year)
+            continue
+        field, value = SEARCH_TERMS[" ".join(term.split())]
+        (injuries if field == "injury" else boroughs).add(value)
+
+    # Precedence follows list order, not the order words appear in the text
+    borough_from_text = next((borough for borough in BOROUGHS if borough in boroughs), None)
+    injury_from_text = next((injury for injury in INJURY_PRIORITY if injury in injuries), None)
+    return borough_from_text, year_from_text, injury_from_text
 
-def apply_search_text(df_in, text):
-    """Apply search text filters safely"""
+# ======================
+# Crash Counts
+# ======================
+def build_crash_counts():
+    """Precompute crash counts per (borough, year, vehicle) on the unfiltered data"""
     try:
-        if not text or df_in.empty:
-            return df_in, None, None, None
-
-        text_u = text.upper()
-
-        # Find borough
-        borough_from_text = next((b for b in BOROUGHS if b in text_u), None)
-
-        # Year extraction
-        year_from_text = None
-        for token in text_u.split():
-            if token.isdigit() and len(token) == 4:
-                y = int(token)
-                if 2012 <= y <= 2030:
-                    year_from_text = y
-                    break
-
-        # Injury type
-        injury_from_text = None
-        if "PEDESTRIAN" in text_u:
-            injury_from_text = "PEDESTRIAN"
-        elif "CYCLIST" in text_u or "BICYCLE" in text_u:
-            injury_from_text = "CYCLIST" 
-        elif "MOTORIST" in text_u or "DRIVER" in text_u:
-            injury_from_text = "MOTORIST"
-
-        df_out = df_in.copy()
-        if borough_from_text and 'BOROUGH' in df_out.columns:
-            df_out = df_out[df_out["BOROUGH"] == borough_from_text]
-        if year_from_text and 'YEAR' in df_out.columns:
-            df_out = df_out[df_out["YEAR"] == year_from_text]
-        if injury_from_text and 'INJURY_TYPE' in df_out.columns:
-            df_out = df_out[df_out["INJURY_TYPE"] == injury_from_text]
-
-        return df_out, borough_from_text, year_from_text, injury_from_text
-        
+        if df.empty or not {'BOROUGH', 'YEAR', 'VEHICLE_CATEGORY'}.issubset(df.columns):
+            return None
+        return df.groupby(['BOROUGH', 'YEAR', 'VEHICLE_CATEGORY'], observed=True, dropna=False).size()
+    except Exception as e:
+        logger.error(f"Error precomputing crash counts: {e}")
+        return None
+
+CRASH_COUNTS = build_crash_counts()
+logger.info("Crash counts precomputed")
+
+def year_bounds():
+    """(first year, number of years) in the data, or None when YEAR is unusable"""
+    try:
+        if df.empty or 'YEAR' not in df.columns or df["YEAR"].notna().sum() == 0:
+            return None
+        first, last = int(df["YEAR"].min()), int(df["YEAR"].max())
+        return first, last - first + 1
     except Exception as e:
-        logger.error(f"Error in apply_search_text: {e}")
-        return df_in, None, None, None
+        logger.error(f"Error computing year bounds: {e}")
+        return None
+
+YEAR_BOUNDS = year_bounds()
+
+def count_crashes_fused(dff):
+    """Borough and year counts from one np.bincount pass over integer codes"""
+    first_year, n_years = YEAR_BOUNDS
+    boroughs = dff["BOROUGH"].cat.categories
+
+    # Shift both codes by one so missing values land in slot 0 instead of being dropped
+    borough_codes = dff["BOROUGH"].cat.codes.to_numpy().astype(np.int64) + 1
+    year_codes = dff["YEAR"].to_numpy(dtype=np.int64, na_value=first_year - 1) - first_year + 1
+    grid = np.bincount(
+        borough_codes * (n_years + 1) + year_codes,
+        minlength=(len(boroughs) + 1) * (n_years + 1),
+    ).reshape(len(boroughs) + 1, n_years + 1)
+
+    borough_counts = pd.Series(grid[1:, :].sum(axis=1), index=boroughs).sort_values(ascending=False)
+    year_counts = pd.Series(grid[:, 1:].sum(axis=0), index=range(first_year, first_year + n_years))
+    return borough_counts[borough_counts > 0], year_counts[year_counts > 0]
+
+def count_crashes(dff):
+    """Borough and year crash counts for the filtered rows"""
+    if (
+        YEAR_BOUNDS is not None
+        and 'BOROUGH' in dff.columns
+        and isinstance(dff["BOROUGH"].dtype, pd.CategoricalDtype)
+    ):
+        return count_crashes_fused(dff)
+
+    borough_counts = year_counts = None
+    if 'BOROUGH' in dff.columns:
+        # value_counts already sorts descending; drop unobserved categories
+        borough_counts = dff["BOROUGH"].value_counts()
+        borough_counts = borough_counts[borough_counts > 0]
+    if 'YEAR' in dff.columns:
+        year_counts = dff["YEAR"].value_counts().sort_index()
+    return borough_counts, year_counts
+
+def count_crashes_precomputed(boroughs, years, vehicles):
+    """Borough and year crash counts sliced from CRASH_COUNTS instead of the raw rows"""
+    counts = CRASH_COUNTS
+    for level, values in (('BOROUGH', boroughs), ('YEAR', years), ('VEHICLE_CATEGORY', vehicles)):
+        if values:
+            counts = counts[counts.index.get_level_values(level).isin(values)]
+    borough_counts = counts.groupby(level='BOROUGH', observed=True).sum().sort_values(ascending=False)
+    year_counts = counts.groupby(level='YEAR').sum().sort_index()
+    return borough_counts[borough_counts > 0], year_counts
+
+# ======================
+# Precomputed Filter Masks
+# ======================
+FILTER_COLUMNS = ['BOROUGH', 'YEAR', 'VEHICLE_CATEGORY', 'CONTRIBUTING FACTOR VEHICLE 1', 'INJURY_TYPE']
+
+# Row masks are stored bit-packed (8 rows per byte) to keep memory at N/8 per value
+PACKED_MASK_LEN = (len(df) + 7) // 8
+
+def build_filter_masks():
+    """Precompute a packed row mask for every value of every filter column"""
+    masks = {}
+    for col in FILTER_COLUMNS:
+        try:
+            if col not in df.columns:
+                continue
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                codes = df[col].cat.codes.to_numpy()
+                masks[col] = {val: np.packbits(codes == code) for code, val in enumerate(df[col].cat.categories)}
+            else:
+                values = [int(val) if pd.api.types.is_integer(val) else val for val in df[col].dropna().unique()]
+                masks[col] = {val: np.packbits(category_isin(df[col], [val])) for val in values}
+        except Exception as e:
+            logger.error(f"Error precomputing masks for {col}: {e}")
+    return masks
+
+FILTER_MASKS = build_filter_masks()
+logger.info("Filter masks precomputed")
+
+def packed_filter_mask(column, values):
+    """OR together the precomputed masks for the selected values of one column"""
+    value_masks = FILTER_MASKS.get(column)
+    if value_masks is None:
+        return np.packbits(category_isin(df[column], values))
+
+    col_mask = np.zeros(PACKED_MASK_LEN, dtype=np.uint8)
+    for val in values:
+        val_mask = value_masks.get(val)
+        if val_mask is not None:
+            col_mask |= val_mask
+    return col_mask
+
+# ======================
+# Report Builder (memoized)
+# ======================
+# Columns read by count_crashes and create_map
+REPORT_COLUMNS = ['BOROUGH', 'YEAR', 'LATITUDE', 'LONGITUDE']
+
+def filter_key(values):
+    """Canonicalize a dropdown value list into a hashable cache key"""
+    return tuple(sorted(values)) if values else ()
+
+def serialize_figures(*figures):
+    """Serialize figures once so cache hits skip plotly's JSON encoding
+
+    Returns (figure JSON strings, whether any figure is an error figure).
+    """
+    return tuple(fig.to_json() for fig in figures), any(is_error_figure(fig) for fig in figures)
+
+def report_succeeded(report):
+    """Cache filter for build_report - never keep a report containing error figures"""
+    _, failed = report
+    return not failed
+
+@cache.memoize(response_filter=report_succeeded)
+def build_report(boroughs, years, vehicles, factors, injuries, search_text):
+    """Filter the data and build all report figures as (JSON strings, failed flag)"""
+    if df.empty:
+        logger.warning("No data available - returning empty figures")
+        empty_fig = create_empty_figure("No data available")
+        return serialize_figures(empty_fig, empty_fig, empty_fig)
+
+    # Combine dropdown filters into one packed bitmask, then index once
+    filter_operations = [
+        ('BOROUGH', boroughs),
+        ('YEAR', years), 
+        ('VEHICLE_CATEGORY', vehicles),
+        ('CONTRIBUTING FACTOR VEHICLE 1', factors),
+        ('INJURY_TYPE', injuries)
+    ]
+
+    # Search terms are just extra single-value filters on the same columns
+    try:
+        search_terms = parse_search_text(search_text)
+        for column, value in zip(('BOROUGH', 'YEAR', 'INJURY_TYPE'), search_terms):
+            if value:
+                filter_operations.append((column, [value]))
+    except Exception as e:
+        logger.error(f"Error applying search text: {e}")
+    
+    packed = np.full(PACKED_MASK_LEN, 0xFF, dtype=np.uint8)
+    for column, values in filter_operations:
+        if values and column in df.columns:
+            packed &= packed_filter_mask(column, values)
+            logger.info(f"Applied {column} filter")
+
+    # Gather only the columns the charts aggregate; filter columns are already in the mask
+    report_columns = [col for col in REPORT_COLUMNS if col in df.columns]
+    dff = df.loc[np.unpackbits(packed, count=len(df)).astype(bool), report_columns]
+
+    # Handle empty results
+    if dff.empty:
+        logger.info("No data matches filters")
+        empty_fig = create_empty_figure("No data matches your filters")
+        return serialize_figures(empty_fig, empty_fig, empty_fig)
+
+    logger.info(f"Data after filtering: {len(dff)} records")
+
+    # Borough/year/vehicle-only filters can be answered from CRASH_COUNTS
+    use_precomputed = CRASH_COUNTS is not None and not (factors or injuries or search_text)
+
+    # Create visualizations
+    if use_precomputed:
+        borough_counts, year_counts = count_crashes_precomputed(boroughs, years, vehicles)
+    else:
+        borough_counts, year_counts = count_crashes(dff)
+    fig_bar = create_bar_chart(borough_counts)
+    fig_line = create_line_chart(year_counts)
+    fig_map = create_map(dff)
+
+    logger.info("All visualizations created successfully")
+    return serialize_figures(fig_bar, fig_line, fig_map)
 
 # ======================
 # Main Callback with Comprehensive Error Handling
@@ -318,51 +473,20 @@ def update_report(n_clicks, boroughs, years, vehicles, factors, injuries, search
     """Main callback to update all visualizations"""
     try:
         logger.info(f"Callback triggered - n_clicks: {n_clicks}")
-        
-        # Start with original data
-        dff = df.copy()
-        
-        if dff.empty:
-            logger.warning("No data available - returning empty figures")
-            empty_fig = create_empty_figure("No data available")
-            return empty_fig, empty_fig, empty_fig
-
-        # Apply dropdown filters safely
-        filter_operations = [
-            ('BOROUGH', boroughs),
-            ('YEAR', years), 
-            ('VEHICLE_CATEGORY', vehicles),
-            ('CONTRIBUTING FACTOR VEHICLE 1', factors),
-            ('INJURY_TYPE', injuries)
-        ]
-        
-        for column, values in filter_operations:
-            if values and column in dff.columns:
-                dff = dff[dff[column].isin(values)]
-                logger.info(f"Applied {column} filter: {len(dff)} records remaining")
-
-        # Apply search text
-        dff, _, _, _ = apply_search_text(dff, search_text)
-
-        # Handle empty results
-        if dff.empty:
-            logger.info("No data matches filters")
-            empty_fig = create_empty_figure("No data matches your filters")
-            return empty_fig, empty_fig, empty_fig
-
-        logger.info(f"Data after filtering: {len(dff)} records")
-
-        # Create visualizations
-        fig_bar = create_bar_chart(dff)
-        fig_line = create_line_chart(dff) 
-        fig_map = create_map(dff)
 
-        logger.info("All visualizations created successfully")
-        return fig_bar, fig_line, fig_map
+        figures, _ = build_report(
+            filter_key(boroughs),
+            filter_key(years),
+            filter_key(vehicles),
+            filter_key(factors),
+            filter_key(injuries),
+            (search_text or "").strip(),
+        )
+        return tuple(json.loads(fig_json) for fig_json in figures)
 
     except Exception as e:
         logger.error(f"Error in update_report callback: {e}")
-        error_fig = create_empty_figure("Error generating report")
+        error_fig = create_error_figure("Error generating report")
         return error_fig, error_fig, error_fig
 
 # ======================
@@ -378,14 +502,25 @@ def create_empty_figure(message="No data available"):
         annotations=[dict(text=message, x=0.5, y=0.5, xref="paper", yref="paper", showarrow=False)]
     )
 
-def create_bar_chart(dff):
-    """Create borough bar chart"""
+# Marks figures built from a caught exception so build_report does not cache them
+ERROR_FIGURE_META = "error"
+
+def create_error_figure(message):
+    """Create an empty figure flagged as the result of a failure"""
+    return create_empty_figure(message).update_layout(meta=ERROR_FIGURE_META)
+
+def is_error_figure(fig):
+    """True for figures produced by create_error_figure"""
+    return fig.layout.meta == ERROR_FIGURE_META
+
+def create_bar_chart(borough_counts):
+    """Create borough bar chart from a Series of crash counts per borough"""
     try:
-        if dff.empty or 'BOROUGH' not in dff.columns:
+        if borough_counts is None or borough_counts.empty:
             return create_empty_figure("No borough data available")
             
-        bar_df = dff.groupby("BOROUGH").size().reset_index(name="crash_count")
-        bar_df = bar_df.sort_values("crash_count", ascending=False)
+        bar_df = borough_counts.rename_axis("BOROUGH").reset_index(name="crash_count")
+        bar_df["BOROUGH"] = bar_df["BOROUGH"].astype(str)
         
         fig = px.bar(
             bar_df,
@@ -399,21 +534,22 @@ def create_bar_chart(dff):
             plot_bgcolor='white',
             paper_bgcolor='white',
             xaxis_title="Borough",
-            yaxis_title="Number of Crashes"
+            yaxis_title="Number of Crashes",
+            uirevision="report"
         )
         return fig
     except Exception as e:
         logger.error(f"Error creating bar chart: {e}")
-        return create_empty_figure("Error creating bar chart")
+        return create_error_figure("Error creating bar chart")
 
-def create_line_chart(dff):
-    """Create time series line chart"""
+def create_line_chart(year_counts):
+    """Create time series line chart from a Series of crash counts per year"""
     try:
-        if dff.empty or 'YEAR' not in dff.columns:
+        if year_counts is None or year_counts.empty:
             return create_empty_figure("No year data available")
             
-        time_df = dff.groupby("YEAR").size().reset_index(name="crash_count")
-        time_df = time_df.sort_values("YEAR")
+        time_df = year_counts.rename_axis("YEAR").reset_index(name="crash_count")
+        time_df["YEAR"] = time_df["YEAR"].astype(int)
         
         fig = px.line(
             time_df,
@@ -427,12 +563,34 @@ def create_line_chart(dff):
             plot_bgcolor='white',
             paper_bgcolor='white',
             xaxis_title="Year",
-            yaxis_title="Number of Crashes"
+            yaxis_title="Number of Crashes",
+            uirevision="report"
         )
         return fig
     except Exception as e:
         logger.error(f"Error creating line chart: {e}")
-        return create_empty_figure("Error creating line chart")
+        return create_error_figure("Error creating line chart")
+
+# NYC extent (with a small margin past Tottenville, the Bronx and eastern Queens)
+# and grid cell size (~500m) used to bin crash locations server-side.
+# np.histogram2d drops points outside these ranges.
+MAP_LON_RANGE = (-74.27, -73.68)
+MAP_LAT_RANGE = (40.47, 40.93)
+MAP_BIN_DEGREES = 0.005
+
+def bin_locations(lon, lat):
+    """Count crashes per grid cell over the NYC extent, returning non-empty cells"""
+    lon_bins = int(round((MAP_LON_RANGE[1] - MAP_LON_RANGE[0]) / MAP_BIN_DEGREES))
+    lat_bins = int(round((MAP_LAT_RANGE[1] - MAP_LAT_RANGE[0]) / MAP_BIN_DEGREES))
+    counts, lon_edges, lat_edges = np.histogram2d(
+        lon, lat, bins=(lon_bins, lat_bins), range=[MAP_LON_RANGE, MAP_LAT_RANGE]
+    )
+    ix, iy = np.nonzero(counts)
+    return pd.DataFrame({
+        "LONGITUDE": (lon_edges[ix] + lon_edges[ix + 1]) / 2,
+        "LATITUDE": (lat_edges[iy] + lat_edges[iy + 1]) / 2,
+        "crash_count": counts[ix, iy].astype(int),
+    })
 
 def create_map(dff):
     """Create crash location map"""
@@ -444,31 +602,29 @@ def create_map(dff):
         if map_df.empty:
             return create_empty_figure("No valid location data")
             
-        # Sample data for performance
-        map_sample = map_df.sample(min(5000, len(map_df)), random_state=42)
+        # Bin every crash into grid cells instead of sampling individual points
+        grid_df = bin_locations(map_df["LONGITUDE"].to_numpy(), map_df["LATITUDE"].to_numpy())
+        if grid_df.empty:
+            return create_empty_figure("No valid location data")
         
         fig = px.density_mapbox(
-            map_sample,
+            grid_df,
             lat="LATITUDE",
             lon="LONGITUDE",
+            z="crash_count",
             radius=10,
             center={"lat": 40.7128, "lon": -74.0060},
             zoom=9,
             height=500,
-            hover_data={
-                "BOROUGH": True,
-                "CRASH_DATETIME": True,
-                "INJURY_TYPE": True,
-            },
             title="Crash Density Heatmap",
             color_continuous_scale="hot"
         )
-        fig.update_layout(mapbox_style="open-street-map")
+        fig.update_layout(mapbox_style="open-street-map", uirevision="report")
         return fig
         
     except Exception as e:
         logger.error(f"Error creating map: {e}")
-        return create_empty_figure("Error creating map")
+        return create_error_figure("Error creating map")
 
 # ======================
 # Deployment Configuration
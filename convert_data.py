@@ -0,0 +1,35 @@
+"""One-shot conversion of the collisions CSV into faster-loading columnar files.
+
+Run once (locally or as a build step) next to the CSV:
+
+    python convert_data.py
+
+This writes collisions.arrow (memory-mapped by the dashboard and shared across
+gunicorn workers) and collisions.parquet (compact fallback). The dashboard falls
+back to the CSV when neither exists.
+"""
+import logging
+
+import pyarrow as pa
+
+from data import ARROW_FILE, CSV_FILE, PARQUET_FILE, read_csv_file
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    df = read_csv_file(CSV_FILE)
+
+    df.to_parquet(PARQUET_FILE, engine="pyarrow", compression="zstd", index=False)
+    logger.info(f"Wrote {len(df)} rows to {PARQUET_FILE}")
+
+    # Uncompressed IPC file so it can be memory-mapped without decoding
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(ARROW_FILE, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    logger.info(f"Wrote {table.num_rows} rows to {ARROW_FILE}")
+
+
+if __name__ == "__main__":
+    main()
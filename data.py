@@ -0,0 +1,287 @@
+"""Loading and preparation of the collisions dataset.
+
+Shared by app.py (dashboard startup) and convert_data.py (one-shot conversion
+to Arrow/Parquet), so the conversion does not have to import the dashboard.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ======================
+# Data Loading with Error Handling
+# ======================
+CSV_FILE = "cleaned_collisions_persons.csv"
+PARQUET_FILE = "collisions.parquet"
+ARROW_FILE = "collisions.arrow"
+
+# Try multiple possible file locations
+DATA_DIRS = ["", "./", "/etc/secrets/"]
+
+# Only the columns the dashboard actually touches
+DATA_COLUMNS = [
+    "BOROUGH",
+    "YEAR",
+    "VEHICLE TYPE CODE 1",
+    "CONTRIBUTING FACTOR VEHICLE 1",
+    "INJURY_TYPE",
+    "LATITUDE",
+    "LONGITUDE",
+]
+
+# Explicit dtypes so read_csv skips the type-inference pass
+CSV_DTYPES = {
+    "BOROUGH": "category",
+    "YEAR": "Int16",
+    "VEHICLE TYPE CODE 1": "category",
+    "CONTRIBUTING FACTOR VEHICLE 1": "category",
+    "INJURY_TYPE": "category",
+    "LATITUDE": "float32",
+    "LONGITUDE": "float32",
+}
+
+# Rows per CSV chunk - bounds peak memory during load to roughly one chunk
+CSV_CHUNK_SIZE = 200_000
+
+def concat_chunks(chunks):
+    """Concatenate prepared chunks, keeping categorical columns categorical"""
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            # Each chunk infers its own categories; align them so concat keeps the dtype
+            categories = sorted(set().union(*(chunk[col].cat.categories for chunk in chunks)))
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True, copy=False)
+
+def read_csv_chunked(path):
+    """Stream the collisions CSV in chunks with pandas, preparing each before concatenation"""
+    reader = pd.read_csv(
+        path,
+        usecols=lambda col: col in DATA_COLUMNS,
+        dtype=CSV_DTYPES,
+        chunksize=CSV_CHUNK_SIZE,
+    )
+    chunks = [prepare_frame(chunk) for chunk in reader]
+    if not chunks:
+        return prepare_frame(pd.DataFrame(columns=DATA_COLUMNS))
+    return concat_chunks(chunks)
+
+def read_csv_file(path):
+    """Read the collisions CSV with pyarrow's multithreaded parser
+
+    String columns are dictionary-encoded while parsing, so they arrive as
+    categoricals. Falls back to the pandas chunked reader if pyarrow is
+    unavailable or cannot parse the file.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+
+        arrow_types = {
+            "category": pa.dictionary(pa.int32(), pa.string()),
+            "Int16": pa.int16(),
+            "float32": pa.float32(),
+        }
+        table = pa_csv.read_csv(
+            path,
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=DATA_COLUMNS,
+                column_types={col: arrow_types[dtype] for col, dtype in CSV_DTYPES.items()},
+                strings_can_be_null=True,
+            ),
+        )
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        logger.warning(f"pyarrow CSV reader unavailable for {path} ({e}), using pandas")
+        return read_csv_chunked(path)
+
+    # to_pandas unifies the per-block dictionaries into one categorical per column
+    return prepare_frame(table.to_pandas())
+
+def read_parquet_file(path):
+    """Read the columnar copy produced by convert_data.py"""
+    return prepare_frame(pd.read_parquet(path, columns=DATA_COLUMNS))
+
+def read_arrow_file(path):
+    """Memory-map the Arrow IPC copy produced by convert_data.py
+
+    The file is mapped rather than read, so gunicorn workers share its pages
+    through the OS page cache. split_blocks lets null-free numeric columns
+    (LATITUDE/LONGITUDE) stay zero-copy views of the mapping.
+    """
+    import pyarrow as pa
+
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    columns = [col for col in DATA_COLUMNS if col in table.column_names]
+    return prepare_frame(table.select(columns).to_pandas(split_blocks=True, self_destruct=False))
+
+def read_first_available(filename, reader):
+    """Try each data directory in turn, returning None if nothing loads"""
+    for data_dir in DATA_DIRS:
+        path = f"{data_dir}{filename}"
+        try:
+            df = reader(path)
+            logger.info(f"Successfully loaded data from {path}: {len(df)} rows")
+            return df
+        except FileNotFoundError:
+            logger.warning(f"File not found at {path}, trying next...")
+        except Exception as e:
+            logger.error(f"Error loading {path}: {e}")
+    return None
+
+def load_data():
+    """Load and prepare data with comprehensive error handling"""
+    try:
+        logger.info("Attempting to load Arrow file...")
+        df = read_first_available(ARROW_FILE, read_arrow_file)
+
+        if df is None:
+            logger.info("Falling back to Parquet file...")
+            df = read_first_available(PARQUET_FILE, read_parquet_file)
+
+        if df is None:
+            logger.info("Falling back to CSV file...")
+            df = read_first_available(CSV_FILE, read_csv_file)
+        
+        if df is None:
+            logger.error("Could not load CSV from any path. Creating empty dataset.")
+            return pd.DataFrame()
+        
+        # Validate required columns
+        required_columns = ['BOROUGH', 'YEAR', 'VEHICLE TYPE CODE 1', 'CONTRIBUTING FACTOR VEHICLE 1', 'INJURY_TYPE']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        if missing_columns:
+            logger.warning(f"Missing columns: {missing_columns}")
+        
+        return df
+        
+    except Exception as e:
+        logger.error(f"Critical error in load_data: {e}")
+        return pd.DataFrame()
+
+# ======================
+# Vehicle Category Cleaner
+# ======================
+def normalize_vehicle(v):
+    """Normalize vehicle types with error handling"""
+    try:
+        if pd.isna(v):
+            return "UNKNOWN"
+        
+        s = str(v).upper()
+
+        # Vehicle type mapping
+        if "AMB" in s or "AMBUL" in s:
+            return "AMBULANCE"
+        if "TAXI" in s:
+            return "TAXI"
+        if "BUS" in s:
+            return "BUS"
+        if "MOTORCYCLE" in s or "SCOOTER" in s or "MOTORBIKE" in s:
+            return "MOTORCYCLE"
+        if "BICYCLE" in s or "BIKE" in s:
+            return "BICYCLE"
+        if "SUV" in s or "STATION WAGON" in s:
+            return "SUV"
+        if "PICK" in s or "PICK-UP" in s or "PICKUP" in s:
+            return "TRUCK/VAN"
+        if "TRUCK" in s or "VAN" in s:
+            return "TRUCK/VAN"
+        if "SEDAN" in s or "4 DOOR" in s or "4-DOOR" in s or "2 DOOR" in s or "2-DOOR" in s:
+            return "CAR"
+
+        return "OTHER"
+    except Exception as e:
+        logger.warning(f"Error normalizing vehicle '{v}': {e}")
+        return "UNKNOWN"
+
+# Ordered (category, pattern) rules - first match wins, mirroring normalize_vehicle
+VEHICLE_PATTERNS = [
+    ("AMBULANCE", r"AMB|AMBUL"),
+    ("TAXI", r"TAXI"),
+    ("BUS", r"BUS"),
+    ("MOTORCYCLE", r"MOTORCYCLE|SCOOTER|MOTORBIKE"),
+    ("BICYCLE", r"BICYCLE|BIKE"),
+    ("SUV", r"SUV|STATION WAGON"),
+    ("TRUCK/VAN", r"PICK-?UP|PICK"),
+    ("TRUCK/VAN", r"TRUCK|VAN"),
+    ("CAR", r"SEDAN|[24][- ]DOOR"),
+]
+
+def categorize_vehicles(vehicle_types):
+    """Vectorized vehicle categorization over a whole column"""
+    if isinstance(vehicle_types.dtype, pd.CategoricalDtype):
+        # Categorize the few distinct raw types once, then broadcast through the codes
+        category_labels = categorize_vehicles(pd.Series(vehicle_types.cat.categories, dtype=object)).to_numpy()
+        labels = np.append(category_labels, "UNKNOWN")  # code -1 (missing) maps to the last slot
+        return pd.Series(labels[vehicle_types.cat.codes.to_numpy()], index=vehicle_types.index)
+
+    s = vehicle_types.astype("string").str.upper()
+    masks = [s.str.contains(pattern, regex=True, na=False).to_numpy(dtype=bool) for _, pattern in VEHICLE_PATTERNS]
+    labels = [label for label, _ in VEHICLE_PATTERNS]
+    default = np.where(s.isna().to_numpy(), "UNKNOWN", "OTHER")
+    return pd.Series(np.select(masks, labels, default=default), index=vehicle_types.index)
+
+def add_vehicle_category(frame):
+    """Add VEHICLE_CATEGORY, falling back to per-row normalization on error"""
+    if frame.empty or 'VEHICLE TYPE CODE 1' not in frame.columns:
+        frame["VEHICLE_CATEGORY"] = "UNKNOWN"
+        logger.warning("Vehicle categorization skipped - missing required column")
+        return frame
+    try:
+        frame["VEHICLE_CATEGORY"] = categorize_vehicles(frame["VEHICLE TYPE CODE 1"])
+    except Exception as e:
+        logger.warning(f"Vectorized categorization failed, falling back to per-row: {e}")
+        frame["VEHICLE_CATEGORY"] = frame["VEHICLE TYPE CODE 1"].apply(normalize_vehicle)
+    return frame
+
+# ======================
+# Numeric Downcasting
+# ======================
+# Years fit in int16; float32 keeps NYC coordinates to ~1m, plenty for a heatmap
+NUMERIC_DTYPES = {"YEAR": "Int16", "LATITUDE": "float32", "LONGITUDE": "float32"}
+
+def downcast_numeric(frame):
+    """Narrow numeric dtypes"""
+    for col, dtype in NUMERIC_DTYPES.items():
+        if col in frame.columns and frame[col].dtype != dtype:
+            frame[col] = frame[col].astype(dtype)
+    return frame
+
+# ======================
+# Categorical Dtypes
+# ======================
+CATEGORICAL_COLUMNS = [
+    'BOROUGH',
+    'VEHICLE TYPE CODE 1',
+    'VEHICLE_CATEGORY',
+    'CONTRIBUTING FACTOR VEHICLE 1',
+    'INJURY_TYPE',
+]
+
+def cast_categoricals(frame):
+    """Store the filter columns as pandas categoricals with sorted categories"""
+    for col in CATEGORICAL_COLUMNS:
+        if col not in frame.columns:
+            continue
+        if not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].astype("category")
+        elif not frame[col].cat.categories.is_monotonic_increasing:
+            # Arrow dictionaries keep first-seen order; dropdowns expect sorted categories
+            frame[col] = frame[col].cat.reorder_categories(sorted(frame[col].cat.categories))
+    return frame
+
+# ======================
+# Data Preparation
+# ======================
+def prepare_frame(frame):
+    """Derive VEHICLE_CATEGORY and apply dtypes; safe to run per CSV chunk"""
+    frame = downcast_numeric(frame)
+    frame = cast_categoricals(frame)
+    frame = add_vehicle_category(frame)
+    # Second pass picks up VEHICLE_CATEGORY, which only exists after categorization
+    return cast_categoricals(frame)